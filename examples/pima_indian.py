@@ -4,34 +4,33 @@ import emcee
 import scipy.special as sp
 import time 
 import matplotlib.pyplot as plt
-from functools import partial
+from functools import lru_cache
 sys.path.append(".")
 import harmonic as hm
 sys.path.append("examples")
 import utils
 
 
-def ln_likelihood(y, theta, x):
+def ln_likelihood(y, one_minus_y, z):
     """Compute log_e of Pima Indian likelihood.
 
     Args:
 
         y: Vector of diabetes incidence (1=diabetes, 0=no diabetes).
 
-        theta: Vector of parameter variables associated with covariates x.
+        one_minus_y: Precomputed complement 1-y of the incidence vector.
 
-        x: Vector of data covariates (e.g. NP, PGC, BP, TST, DMI etc.).
+        z: Linear predictor x theta of shape (ndata, nchains), i.e. the data
+            covariates contracted with the parameters of every walker.
 
     Returns:
 
-        double: Value of log_e likelihood at specified point in parameter
-            space.
+        double: Vector of log_e likelihood values, one per walker.
 
     """
 
-    ln_p = compute_ln_p(theta, x)
-    ln_pp = np.log(1. - np.exp(ln_p))
-    return y.T.dot(ln_p) + (1-y).T.dot(ln_pp)
+    return - y.dot(np.logaddexp(0.0, -z)) \
+        - one_minus_y.dot(np.logaddexp(0.0, z))
 
 
 def ln_prior(tau, theta): 
@@ -41,24 +40,30 @@ def ln_prior(tau, theta):
 
         tau: Characteristic width of posterior \in [0.01,1].
 
-        theta: Vector of parameter variables associated with covariates x.
+        theta: Array of parameter variables associated with covariates x, of
+            shape (nchains, ndim).
 
     Returns:
 
-        double: Value of log_e prior at specified point in parameter space.
+        double: Vector of log_e prior values, one per walker.
 
     """
 
-    d = len(theta)
-    return 0.5 * d * np.log(tau/(2.*np.pi)) - 0.5 * tau * theta.T.dot(theta)
+    d = theta.shape[1]
+    return 0.5 * d * np.log(tau/(2.*np.pi)) \
+        - 0.5 * tau * np.einsum('ij,ij->i', theta, theta)
 
 
-def ln_posterior(theta, tau, x, y): 
+def ln_posterior(theta, tau, x, y, one_minus_y): 
     """Compute log_e of Pima Indian multivariate gaussian prior
 
+    Evaluated for the full ensemble of walkers in one call so that emcee can
+    be run with vectorize=True.
+
     Args:
 
-        theta: Vector of parameter variables associated with covariates x.
+        theta: Array of parameter variables associated with covariates x, of
+            shape (nchains, ndim).
 
         tau: Characteristic width of posterior \in [0.01,1].
 
@@ -66,35 +71,39 @@ def ln_posterior(theta, tau, x, y):
 
         y: Vector of incidence. 1=diabetes, 0=no diabetes.
 
+        one_minus_y: Precomputed complement 1-y of the incidence vector.
+
     Returns:
 
-        double: Value of log_e posterior at specified point in parameter
-            space.
+        double: Vector of log_e posterior values, one per walker.
 
     """
 
+    z = x.dot(theta.T)
     ln_pr = ln_prior(tau, theta)
-    ln_L = ln_likelihood(y, theta, x)
+    ln_L = ln_likelihood(y, one_minus_y, z)
 
     return ln_pr + ln_L
 
 
-def compute_ln_p(theta, x):
-    """Computes log_e probability ln(p) to be used in likelihood function.
+@lru_cache(maxsize=1)
+def load_data(filename='examples/data/pima_indian.dat'):
+    """Load Pima Indian data, caching the result for repeated runs.
 
     Args:
 
-        theta: Vector of parameter variables associated with covariates x.
-
-        x: Vector of data covariates (e.g. NP, PGC, BP, TST, DMI e.t.c.).
+        filename: Path of the ASCII data file.
 
     Returns:
 
-        double: Vector of the log-probabilities p to use in likelihood.
+        double: Read-only array of the data, with diabetes incidence in the
+            first column followed by the covariates.
 
     """
 
-    return - np.log(1.0 + 1.0 / np.exp(x.dot(theta)))
+    data = np.loadtxt(filename)
+    data.flags.writeable = False
+    return data
 
 
 def run_example(model_1=True, tau=1.0,
@@ -120,6 +129,11 @@ def run_example(model_1=True, tau=1.0,
 
     """
 
+    if nburn >= samples_per_chain:
+        raise ValueError("Burn in must be shorter than the chains " 
+            "(nburn={}, samples_per_chain={} specified)"
+            .format(nburn, samples_per_chain))
+
     # Set_dimension
     if model_1:
         ndim = 5
@@ -132,7 +146,7 @@ def run_example(model_1=True, tau=1.0,
     #===========================================================================
     hm.logs.info_log('Loading data ...')
 
-    data = np.loadtxt('examples/data/pima_indian.dat')
+    data = load_data()
 
     """
     Two primary models for comparison:
@@ -147,28 +161,28 @@ def run_example(model_1=True, tau=1.0,
     data[:,6] --> Diabetes pedigree function (DP)
     data[:,7] --> Age (AGE)
     """
-    x=np.zeros((len(data), ndim))
-
     if model_1:
-        x[:,0] = 1.0
-        x[:,1] = data[:,1]
-        x[:,2] = data[:,2]
-        x[:,3] = data[:,5]
-        x[:,4] = data[:,6]
-
+        cols = [1, 2, 5, 6]
     else:
-        x[:,0] = 1.0
-        x[:,1] = data[:,1]
-        x[:,2] = data[:,2]
-        x[:,3] = data[:,5]
-        x[:,4] = data[:,6]
-        x[:,5] = data[:,7] # --> model 2.
+        cols = [1, 2, 5, 6, 7] # --> model 2.
+
+    x = np.empty((len(data), ndim))
+    x[:,0] = 1.0
+    x[:,1:] = data[:,cols]
 
     """
     y[:] = 1 if patient has diabetes, 0 if patient does not have diabetes.
     """
     y = data[:,0]
 
+    """
+    The data are fixed for the whole run, so store them contiguously in double
+    precision and precompute 1-y once rather than on every posterior call
+    (x is already built as a contiguous double array above).
+    """
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    one_minus_y = 1.0 - y
+
     """
     Configure some general parameters.
     """
@@ -191,25 +205,12 @@ def run_example(model_1=True, tau=1.0,
     Initial positions for each chain for each covariate \in [0,8).
     Simply drawn from directly from each covariate prior.
     """
-    if model_1:
-        pos_0 = np.random.randn(nchains)*0.01
-        pos_1 = np.random.randn(nchains)*0.01
-        pos_2 = np.random.randn(nchains)*0.01
-        pos_3 = np.random.randn(nchains)*0.01
-        pos_4 = np.random.randn(nchains)*0.01
-        pos = np.c_[pos_0, pos_1, pos_2, pos_3, pos_4]
+    pos = 0.01 * np.random.randn(nchains, ndim)
 
-    else:
-        pos_0 = np.random.randn(nchains)*0.01
-        pos_1 = np.random.randn(nchains)*0.01
-        pos_2 = np.random.randn(nchains)*0.01
-        pos_3 = np.random.randn(nchains)*0.01
-        pos_4 = np.random.randn(nchains)*0.01
-        pos_5 = np.random.randn(nchains)*0.01 
-        pos = np.c_[pos_0, pos_1, pos_2, pos_3, pos_4, pos_5]
-
-    # Start Timer.
-    clock = time.process_time()
+    # Start Timer. Wall-clock time is used since the vectorized posterior runs
+    # on multithreaded BLAS; for a per-function breakdown run this script
+    # under "python -m cProfile -s tottime".
+    clock = time.perf_counter()
 
     #===========================================================================
     # Run Emcee to recover posterior samples 
@@ -217,13 +218,29 @@ def run_example(model_1=True, tau=1.0,
     hm.logs.info_log('Run sampling...')
     """
     Feed emcee the ln_posterior function, starting positions and recover chains.
+    The posterior is evaluated for all walkers at once (vectorize=True).
     """
     sampler = emcee.EnsembleSampler(nchains, ndim, ln_posterior, \
-                                    args=(tau, x, y))
+                                    args=(tau, x, y, one_minus_y), \
+                                    vectorize=True)
     rstate = np.random.get_state()
-    sampler.run_mcmc(pos, samples_per_chain, rstate0=rstate)
-    samples = np.ascontiguousarray(sampler.chain[:,nburn:,:])
-    lnprob = np.ascontiguousarray(sampler.lnprobability[:,nburn:])
+    """
+    Burn in without storing samples, then store only the retained samples so
+    the burn-in never occupies memory in the sampler's backend.
+    """
+    if nburn > 0:
+        state = sampler.run_mcmc(pos, nburn, rstate0=rstate, store=False)
+        sampler.reset()
+        sampler.run_mcmc(state, samples_per_chain - nburn)
+    else:
+        sampler.run_mcmc(pos, samples_per_chain, rstate0=rstate)
+    """
+    emcee stores chains as (nsamples, nchains, ndim) while harmonic expects
+    C-ordered (nchains, nsamples, ndim), so exactly one transposing copy is
+    needed here; ascontiguousarray makes no further copy.
+    """
+    samples = np.ascontiguousarray(sampler.get_chain().swapaxes(0, 1))
+    lnprob = np.ascontiguousarray(sampler.get_log_prob().T)
 
     #===========================================================================
     # Configure emcee chains for harmonic
@@ -319,7 +336,7 @@ def run_example(model_1=True, tau=1.0,
 
     #===========================================================================
     # End Timer.
-    clock = time.process_time() - clock
+    clock = time.perf_counter() - clock
     hm.logs.info_log('Execution time = {}s'.format(clock))
 
     #===========================================================================
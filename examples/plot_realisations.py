@@ -1,10 +1,8 @@
 import numpy as np 
-import matplotlib.pyplot as plt
+import matplotlib
 import argparse
 import os
 import sys
-sys.path.append("examples")
-import utils
 
 savefigs = True
 
@@ -17,8 +15,18 @@ parser.add_argument('filename_realisations', metavar='filename_realisations',
 parser.add_argument('filename_analytic', metavar='filename_analytic', 
                     type=str, 
                     help='Name of file containing analytic inverse variance')
+parser.add_argument('--show', action='store_true',
+                    help='Display plots interactively after saving them')
 args = parser.parse_args()
 
+# Use a non-interactive backend unless plots are to be displayed, so the
+# script can be run headless in batch over many realisation files.
+if not args.show:
+    matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+sys.path.append("examples")
+import utils
+
 # Load data.
 evidence_inv_summary = np.loadtxt(args.filename_realisations)
 evidence_inv_realisations = evidence_inv_summary[:,0]
@@ -54,6 +62,7 @@ if savefigs:
     plt.savefig('./examples/plots/' + filename_base_noext + '_evidence_inv_var.png',
                 bbox_inches='tight')                  
         
-plt.show(block=False)
+if args.show:
+    plt.show(block=False)
 
-input("\nPress Enter to continue...")
+    input("\nPress Enter to continue...")